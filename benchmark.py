@@ -0,0 +1,588 @@
+"""HOme_AI 接口基准测试 / 压测工具
+
+默认用本地替身启动服务端（子进程），再对各接口施加并发负载：
+  - 数据库：SQLite 临时库，按 MySQL 的写法建表，替换 flask_face_server.db_connect
+  - DeepSeek：本地 HTTP 替身，固定回复，可设置响应延迟
+  - 人脸：真实 face_recognition 识别仓库自带的 test_image.jpg，
+          已知人脸库补充随机生成的编码，用于测比对规模
+也可以用 --target 直接压测已部署的服务（此时不启动任何替身）。
+对已部署的服务默认只跑只读场景；写库、删除、上传、调用大模型等场景
+会改动线上数据或触发告警推送、产生费用，需显式加 --allow-writes。
+
+输出为 JSON：每个接口的请求数、错误数、吞吐量和 p50/p95/p99 延迟，
+用 --compare 指定上一次的结果文件即可得到逐项对比。
+
+示例：
+    python benchmark.py --concurrency 8 --requests 500 --output bench_results.json
+    python benchmark.py --endpoints iot_data,iot_data_bulk --compare bench_results.json
+    python benchmark.py --target http://127.0.0.1:5000 --endpoints data_latest,device_list
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests as req
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGE = os.path.join(BASE_DIR, 'test_image.jpg')
+
+# === SQLite 替身：表结构 ===
+# device_data 与 README 建表语句一致；其余表按接口字段给出最小结构
+SQLITE_SCHEMA = """
+CREATE TABLE device_data (
+    device_data_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id VARCHAR(64),
+    led_lightness_color INT,
+    curtain_percent INT,
+    door_state INT,
+    light INT,
+    beep_state INT,
+    airConditioner_state INT,
+    automation_mode_scene INT UNSIGNED,
+    temperature_indoor FLOAT,
+    humidity_indoor FLOAT,
+    smoke INT,
+    comb INT,
+    sr501_state INT,
+    current INT UNSIGNED,
+    voltage INT UNSIGNED,
+    power INT UNSIGNED,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_device_created_at ON device_data (device_id, created_at);
+CREATE TABLE device (
+    device_id VARCHAR(64) PRIMARY KEY,
+    device_name VARCHAR(64),
+    device_type VARCHAR(32),
+    location VARCHAR(64),
+    status INT
+);
+CREATE TABLE command_log (
+    command_log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id VARCHAR(64),
+    command VARCHAR(64),
+    params TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE alarm_event (
+    alarm_event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id VARCHAR(64),
+    alarm_type VARCHAR(32),
+    alarm_value FLOAT,
+    message VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE face_whitelist (
+    face_whitelist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(64),
+    image_path VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE emergency_contact (
+    emergency_contact_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(64),
+    phone VARCHAR(32),
+    relation VARCHAR(32)
+);
+"""
+
+
+# === SQLite 替身：模拟 pymysql 连接 ===
+class SqliteCursor:
+    def __init__(self, conn, dict_rows, timed):
+        self.cursor = conn.cursor()
+        self.dict_rows = dict_rows
+        self.timed = timed
+        self.rows = None
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cursor.close()
+        return False
+
+    @staticmethod
+    def translate(query):
+        query = query.replace('%s', '?')
+        return re.sub(r'^\s*TRUNCATE TABLE', 'DELETE FROM', query, flags=re.I)
+
+    @staticmethod
+    def convert(args):
+        if args is None:
+            return ()
+        return tuple(a.isoformat(sep=' ') if isinstance(a, datetime) else a for a in args)
+
+    def execute(self, query, args=None):
+        with self.timed('db_execute'):
+            self.rows = None
+            if 'information_schema.COLUMNS' in query:
+                # 表结构查询改用 PRAGMA，类型名取括号前的第一个单词，与 MySQL 的 DATA_TYPE 对应
+                table = args[1]
+                info = self.cursor.execute(f"PRAGMA table_info({table})").fetchall()
+                self.rows = [(row[1], row[2].split('(')[0].split()[0].lower()) for row in info]
+                self.description = [('COLUMN_NAME',), ('DATA_TYPE',)]
+                self.rowcount = len(self.rows)
+                return self.rowcount
+            self.cursor.execute(self.translate(query), self.convert(args))
+            self.description = self.cursor.description
+            self.rowcount = self.cursor.rowcount
+            return self.rowcount
+
+    def executemany(self, query, args):
+        with self.timed('db_execute'):
+            self.rows = None
+            self.cursor.executemany(self.translate(query), [self.convert(a) for a in args])
+            self.rowcount = self.cursor.rowcount
+            return self.rowcount
+
+    def as_dict(self, row):
+        if not self.dict_rows or row is None:
+            return row
+        return {col[0]: value for col, value in zip(self.description, row)}
+
+    def fetchone(self):
+        if self.rows is not None:
+            row = self.rows.pop(0) if self.rows else None
+        else:
+            row = self.cursor.fetchone()
+        return self.as_dict(row)
+
+    def fetchall(self):
+        rows = self.rows if self.rows is not None else self.cursor.fetchall()
+        self.rows = []
+        return [self.as_dict(row) for row in rows]
+
+
+class SqliteConnection:
+    def __init__(self, path, dict_cursor_class, timed):
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.dict_cursor_class = dict_cursor_class
+        self.timed = timed
+
+    def cursor(self, cursor=None):
+        dict_rows = cursor is not None and issubclass(cursor, self.dict_cursor_class)
+        return SqliteCursor(self.conn, dict_rows, self.timed)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+
+# === DeepSeek 替身 ===
+def start_mock_llm(delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            body = json.dumps({
+                'choices': [{'message': {'role': 'assistant', 'content': '当前室内温度 23.5°C。'}}],
+                'usage': {'prompt_tokens': 112, 'completion_tokens': 12, 'total_tokens': 124},
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+# === 替身模式服务端（在子进程中运行） ===
+def serve(args):
+    workdir = tempfile.mkdtemp(prefix='home_ai_bench_')
+    db_path = os.path.join(workdir, 'bench.db')
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(SQLITE_SCHEMA)
+        conn.execute("PRAGMA journal_mode=WAL")
+
+    os.environ['DEEPSEEK_API_URL'] = start_mock_llm(args.llm_delay)
+    os.environ.setdefault('DEEPSEEK_API_KEY', 'bench')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    sys.path.insert(0, BASE_DIR)
+    os.chdir(BASE_DIR)
+    import pymysql
+    import numpy as np
+    import flask_face_server as server
+
+    server.db_connect = lambda: SqliteConnection(db_path, pymysql.cursors.DictCursor, server.timed)
+    server.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    server.ARCHIVE_FOLDER = os.path.join(workdir, 'archives')
+    os.makedirs(server.app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(server.ARCHIVE_FOLDER, exist_ok=True)
+    # 跳过 /chat 首次请求时回源 /data/export 生成提示词
+    server.pretrained_prompt_loaded = True
+
+    # 先加载真实人脸库，再补充随机人脸编码，模拟更大的已知人脸库
+    server.preload()
+    rng = np.random.default_rng(args.seed)
+    for i in range(args.known_faces):
+        server.known_face_encodings.append(rng.normal(0, 0.1, 128))
+        server.known_face_names.append(f"synthetic_{i}")
+
+    server.app.run(host='127.0.0.1', port=args.port, threaded=True)
+
+
+def start_server(args):
+    cmd = [sys.executable, os.path.abspath(__file__), '--serve',
+           '--port', str(args.port), '--known-faces', str(args.known_faces),
+           '--llm-delay', str(args.llm_delay), '--seed', str(args.seed)]
+    # 服务端日志写到临时文件，避免管道写满阻塞子进程
+    log_file = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=log_file)
+    base_url = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            log_file.seek(0)
+            raise RuntimeError(f"Stand-in server exited:\n{log_file.read().decode('utf-8', 'replace')}")
+        try:
+            req.get(f"{base_url}/metrics", timeout=1)
+            return proc, base_url
+        except req.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('Stand-in server did not start in time')
+
+
+# === 压测场景 ===
+# 每个场景返回 requests.Session.request 的参数；seq 为全局递增序号，保证主键不重复
+def iot_report(device_id, seq):
+    if seq % 2 == 0:
+        props = {'temperature_indoor': 20 + seq % 10, 'humidity_indoor': 45, 'smoke': seq % 400,
+                 'comb': 10, 'light': 1, 'current': 100, 'voltage': 220, 'power': 22,
+                 'sr501_state': 0, 'beep_state': 0}
+    else:
+        props = {'door_state': 0, 'airConditioner_state': 1, 'curtain_percent': 50,
+                 'led_lightness_color': 80, 'automation_mode_scene': 1}
+    return {'notify_data': {'header': {'device_id': device_id},
+                            'body': {'services': [{'properties': props}]}}}
+
+
+def device_data_row(seq):
+    return {'device_id': f"bench_{seq % 50}", 'temperature_indoor': 23.5, 'humidity_indoor': 40,
+            'smoke': seq % 300, 'door_state': 0}
+
+
+CRUD_PAYLOADS = {
+    'device': lambda seq: {'device_id': f"bench_dev_{seq}", 'device_name': 'lamp',
+                           'device_type': 'light', 'location': 'living_room', 'status': 1},
+    'command_log': lambda seq: {'device_id': 'bench_0', 'command': 'turn_on', 'params': '{}'},
+    'alarm_event': lambda seq: {'device_id': 'bench_0', 'alarm_type': 'smoke',
+                                'alarm_value': 320, 'message': 'bench'},
+    'face_whitelist': lambda seq: {'name': f"user_{seq}", 'image_path': 'known_faces/OIP.jpg'},
+    'emergency_contact': lambda seq: {'name': f"contact_{seq}", 'phone': '13800000000',
+                                      'relation': 'family'},
+}
+
+CRUD_PAYLOADS_UPDATE = {
+    'device': {'status': 0},
+    'command_log': {'command': 'turn_off'},
+    'alarm_event': {'message': 'handled'},
+    'face_whitelist': {'image_path': 'known_faces/OIP.jpg'},
+    'emergency_contact': {'phone': '13900000000'},
+}
+
+CRUD_PKS = {
+    'device': 'device_id',
+    'command_log': 'command_log_id',
+    'alarm_event': 'alarm_event_id',
+    'face_whitelist': 'face_whitelist_id',
+    'emergency_contact': 'emergency_contact_id',
+}
+
+# 删除场景使用的预置行：主键显式指定，与普通预置行（自增 1..seed_rows）不冲突
+DELETE_ID_BASE = 10 ** 8
+
+# 不改动数据、无外部副作用的场景，--target 时默认只跑这些
+READ_ONLY_SCENARIOS = {'data_latest', 'data_get', 'data_export', 'metrics'} | \
+    {f"{t}_{op}" for t in CRUD_PAYLOADS for op in ('list', 'get')}
+
+
+def delete_pool_size(args):
+    """每个删除场景预计发出的请求数（含预热）；按 --duration 运行时超出部分删除的是不存在的行"""
+    return args.requests + args.warmup * args.concurrency
+
+
+def delete_id(table, n):
+    return f"bench_del_{n}" if table == 'device' else DELETE_ID_BASE + n
+
+
+def build_scenarios(args):
+    with open(TEST_IMAGE, 'rb') as f:
+        image = f.read()
+
+    def upload(seq):
+        return {'method': 'POST', 'url': '/upload_photo',
+                'files': {'file': ('test_image.jpg', image, 'image/jpeg')}}
+
+    scenarios = {
+        'upload_photo': upload,
+        # 每个设备交替上报两半数据，一半请求会触发合并入库
+        'iot_data': lambda seq: {'method': 'POST', 'url': '/iot-data',
+                                 'json': iot_report(f"bench_{seq // 2 % 50}", seq)},
+        'iot_data_bulk': lambda seq: {'method': 'POST', 'url': '/iot-data/bulk',
+                                      'json': [iot_report(f"bulk_{seq}_{i // 2}", i)
+                                               for i in range(args.bulk_size)]},
+        'data_insert': lambda seq: {'method': 'POST', 'url': '/data', 'json': device_data_row(seq)},
+        'data_bulk': lambda seq: {'method': 'POST', 'url': '/data/bulk',
+                                  'json': [device_data_row(seq + i) for i in range(args.bulk_size)]},
+        'data_latest': lambda seq: {'method': 'GET', 'url': '/data/latest'},
+        'data_get': lambda seq: {'method': 'GET', 'url': f"/data/{seq % args.seed_rows + 1}"},
+        'data_update': lambda seq: {'method': 'PUT', 'url': f"/data/{seq % args.seed_rows + 1}",
+                                    'json': {'smoke': seq % 300}},
+        'data_delete': lambda seq: {'method': 'DELETE', 'url': f"/data/{DELETE_ID_BASE + seq}"},
+        'data_export': lambda seq: {'method': 'GET', 'url': '/data/export'},
+        'chat': lambda seq: {'method': 'POST', 'url': '/chat', 'json': {'message': '现在室内温度多少？'}},
+        'metrics': lambda seq: {'method': 'GET', 'url': '/metrics'},
+    }
+    for table, payload in CRUD_PAYLOADS.items():
+        item = (lambda seq: f"bench_dev_{seq % args.seed_rows}") if table == 'device' \
+            else (lambda seq: seq % args.seed_rows + 1)
+        scenarios[f"{table}_insert"] = lambda seq, t=table, p=payload: {
+            'method': 'POST', 'url': f"/{t}", 'json': p(seq + 10 ** 7)}
+        scenarios[f"{table}_bulk_insert"] = lambda seq, t=table, p=payload: {
+            'method': 'POST', 'url': f"/{t}",
+            'json': [p(seq * args.bulk_size + i + 2 * 10 ** 7) for i in range(args.bulk_size)]}
+        scenarios[f"{table}_list"] = lambda seq, t=table: {'method': 'GET', 'url': f"/{t}"}
+        scenarios[f"{table}_get"] = lambda seq, t=table, k=item: {'method': 'GET', 'url': f"/{t}/{k(seq)}"}
+        scenarios[f"{table}_update"] = lambda seq, t=table, k=item: {
+            'method': 'PUT', 'url': f"/{t}/{k(seq)}", 'json': CRUD_PAYLOADS_UPDATE[t]}
+        scenarios[f"{table}_bulk_update"] = lambda seq, t=table, k=item: {
+            'method': 'PUT', 'url': f"/{t}",
+            'json': [{CRUD_PKS[t]: k(seq * args.bulk_size + i), **CRUD_PAYLOADS_UPDATE[t]}
+                     for i in range(args.bulk_size)]}
+        scenarios[f"{table}_delete"] = lambda seq, t=table: {
+            'method': 'DELETE', 'url': f"/{t}/{delete_id(t, seq)}"}
+        scenarios[f"{table}_bulk_delete"] = lambda seq, t=table: {
+            'method': 'DELETE', 'url': f"/{t}",
+            'json': {'ids': [delete_id(t, delete_pool_size(args) + seq * args.bulk_size + i)
+                             for i in range(args.bulk_size)]}}
+    return scenarios
+
+
+def post_in_chunks(session, url, rows, chunk=5000):
+    for start in range(0, len(rows), chunk):
+        session.post(url, json=rows[start:start + chunk], timeout=120).raise_for_status()
+
+
+def seed_data(base_url, args):
+    """压测前写入预置行（不计入结果）：
+    seed_rows 行供按主键查询/更新，另有一批显式主键的行供单条删除和批量删除消耗
+    """
+    session = req.Session()
+    pool = delete_pool_size(args) * (1 + args.bulk_size)
+    for table, payload in CRUD_PAYLOADS.items():
+        post_in_chunks(session, f"{base_url}/{table}", [payload(i) for i in range(args.seed_rows)])
+        post_in_chunks(session, f"{base_url}/{table}",
+                       [{**payload(i + 3 * 10 ** 7), CRUD_PKS[table]: delete_id(table, i)} for i in range(pool)])
+    post_in_chunks(session, f"{base_url}/data/bulk", [device_data_row(i) for i in range(args.seed_rows)])
+    post_in_chunks(session, f"{base_url}/data/bulk",
+                   [{**device_data_row(i), 'device_data_id': DELETE_ID_BASE + i}
+                    for i in range(delete_pool_size(args))])
+
+
+# === 负载生成与统计 ===
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(base_url, build_request, args):
+    counter = itertools.count()
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    errors = 0
+    lock = threading.Lock()
+
+    def one_request(measure):
+        nonlocal errors
+        if not hasattr(local, 'session'):
+            local.session = req.Session()
+        options = build_request(next(counter))
+        options['url'] = base_url + options['url']
+        start = time.perf_counter()
+        try:
+            status = local.session.request(timeout=args.timeout, **options).status_code
+        except req.RequestException:
+            status = 'exception'
+        elapsed = time.perf_counter() - start
+        if measure:
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if status == 'exception' or status >= 400:
+                    errors += 1
+
+    def worker(measure, count, deadline):
+        done = 0
+        while (count is None or done < count) and (deadline is None or time.monotonic() < deadline):
+            one_request(measure)
+            done += 1
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda _: worker(False, args.warmup, None), range(args.concurrency)))
+
+        per_worker = None if args.duration else -(-args.requests // args.concurrency)
+        started = time.perf_counter()
+        deadline = time.monotonic() + args.duration if args.duration else None
+        list(pool.map(lambda _: worker(True, per_worker, deadline), range(args.concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'status_codes': statuses,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def compare(current, baseline):
+    """逐接口对比：正数表示比基线慢 / 吞吐量更高"""
+    result = {}
+    for name, stats in current['endpoints'].items():
+        old = baseline.get('endpoints', {}).get(name)
+        if not old:
+            continue
+        entry = {}
+        for key in ('p50', 'p95', 'p99'):
+            new_v, old_v = stats['latency_ms'][key], old['latency_ms'].get(key)
+            if new_v is not None and old_v:
+                entry[f"{key}_change_pct"] = round((new_v - old_v) / old_v * 100, 1)
+        if stats['throughput_rps'] and old.get('throughput_rps'):
+            entry['throughput_change_pct'] = round(
+                (stats['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] * 100, 1)
+        result[name] = entry
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='HOme_AI endpoint benchmark')
+    parser.add_argument('--target', help='压测已运行的服务（如 http://127.0.0.1:5000），不启动替身')
+    parser.add_argument('--port', type=int, default=5055, help='替身服务端口')
+    parser.add_argument('--endpoints', help='逗号分隔的场景名，默认全部（--target 时默认全部只读场景）')
+    parser.add_argument('--allow-writes', action='store_true',
+                        help='--target 时允许运行写库/删除/上传/大模型等有副作用的场景')
+    parser.add_argument('--list', action='store_true', help='列出全部场景名')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求总数')
+    parser.add_argument('--duration', type=float, help='每个场景持续秒数（指定后忽略 --requests）')
+    parser.add_argument('--warmup', type=int, default=5, help='每个并发线程的预热请求数，不计入结果')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--bulk-size', type=int, default=100, help='批量场景每次请求的记录数')
+    parser.add_argument('--seed-rows', type=int, default=200, help='压测前每张表预置的行数')
+    parser.add_argument('--known-faces', type=int, default=1000, help='补充的随机人脸编码数')
+    parser.add_argument('--llm-delay', type=float, default=0.05, help='DeepSeek 替身响应延迟（秒）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--output', help='结果 JSON 写入文件，默认输出到标准输出')
+    parser.add_argument('--compare', help='上一次的结果 JSON，用于对比')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        serve(args)
+        return
+
+    scenarios = build_scenarios(args)
+    if args.list:
+        print('\n'.join(f"{n}{'' if n in READ_ONLY_SCENARIOS else '  (writes)'}" for n in scenarios))
+        return
+    read_only = args.target and not args.allow_writes
+    if args.endpoints:
+        names = args.endpoints.split(',')
+    else:
+        names = [n for n in scenarios if not read_only or n in READ_ONLY_SCENARIOS]
+    unknown = [n for n in names if n not in scenarios]
+    if unknown:
+        sys.exit(f"Unknown endpoints: {', '.join(unknown)} (see --list)")
+    if read_only:
+        writes = [n for n in names if n not in READ_ONLY_SCENARIOS]
+        if writes:
+            sys.exit(f"Refusing to run write scenarios against --target without --allow-writes: "
+                     f"{', '.join(writes)}")
+
+    proc = None
+    if args.target:
+        base_url = args.target.rstrip('/')
+    else:
+        proc, base_url = start_server(args)
+    try:
+        if proc is not None:
+            seed_data(base_url, args)
+
+        report = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'target': args.target or 'stand-in',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {k: getattr(args, k) for k in (
+                'concurrency', 'requests', 'duration', 'warmup', 'bulk_size',
+                'seed_rows', 'known_faces', 'llm_delay', 'seed')},
+            'endpoints': {},
+        }
+        for name in names:
+            stats = run_scenario(base_url, scenarios[name], args)
+            report['endpoints'][name] = stats
+            print(f"{name:32s} {stats['throughput_rps']:>9} rps  p50={stats['latency_ms']['p50']}ms  "
+                  f"p95={stats['latency_ms']['p95']}ms  p99={stats['latency_ms']['p99']}ms  "
+                  f"errors={stats['errors']}", file=sys.stderr)
+
+        if args.compare:
+            with open(args.compare, encoding='utf-8') as f:
+                report['comparison'] = compare(report, json.load(f))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
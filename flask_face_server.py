@@ -1,11 +1,22 @@
-from flask import Flask, request, jsonify
-import face_recognition
+from flask import Flask, request, jsonify, Response, g
 import os
 from werkzeug.utils import secure_filename
 import requests as req
 from dotenv import load_dotenv
+import atexit
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from functools import lru_cache
 
 # === 环境初始化 ===
+# 最先加载 .env，后面的日志级别、订阅上限、告警规则等配置都从环境变量读取
+load_dotenv()
 app = Flask(__name__)
 UPLOAD_FOLDER = 'uploads'
 KNOWN_FACES_DIR = 'known_faces'
@@ -14,20 +25,211 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(KNOWN_FACES_DIR, exist_ok=True)
 
+# === 日志 ===
+# 结构化（每行一个 JSON）、分级、限流的日志，级别由环境变量 LOG_LEVEL 控制，默认 INFO。
+# 同一条日志模板每 LOG_RATE_PERIOD 秒最多输出 LOG_RATE_BURST 次，被抑制的条数在下一条里带出。
+LOG_RATE_BURST = 10
+LOG_RATE_PERIOD = 60
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, burst=LOG_RATE_BURST, period=LOG_RATE_PERIOD):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        # (logger, level, 模板) -> [窗口开始时间, 已输出条数, 已抑制条数]
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                if window and window[2]:
+                    record.suppressed = window[2]
+                self.windows[key] = [now, 1, 0]
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+logger = logging.getLogger('home_ai')
+if not logger.handlers:
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(JsonFormatter())
+    log_handler.addFilter(RateLimitFilter())
+    logger.addHandler(log_handler)
+    logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    logger.propagate = False
+
+
+# === 运行指标 ===
+# 进程内的请求耗时直方图与计数器，由 /metrics 以 Prometheus 文本格式导出。
+#   http_request_duration_seconds{route, method}  每个接口的耗时（_count 即吞吐量）
+#   http_requests_total{route, method, status}    按状态码计数
+#   operation_duration_seconds{operation}         子步骤耗时：人脸检测/编码/比对、数据库连接/执行、大模型请求
+# 指标不跨进程汇总，gunicorn 多 worker 时每次抓取只看到其中一个 worker（见 gunicorn.conf.py）。
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 长连接或自身不计入的接口
+METRICS_SKIP_ROUTES = {'/stream', '/metrics', '/healthz', '/readyz'}
+
+
+def format_labels(names, values):
+    return ','.join(f'{n}="{v}"' for n, v in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [各桶计数..., 总数, 总和]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = [(labels, list(series)) for labels, series in self.series.items()]
+        for labels, series in sorted(items):
+            base = format_labels(self.label_names, labels)
+            prefix = base + ',' if base else ''
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{base}}} {series[-2]}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-1]:.6f}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.series.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{{{format_labels(self.label_names, labels)}}} {value}')
+        return lines
+
+
+request_latency = Histogram('http_request_duration_seconds', 'Request latency by route',
+                            ('route', 'method'))
+request_count = Counter('http_requests_total', 'Requests by route and status',
+                        ('route', 'method', 'status'))
+operation_latency = Histogram('operation_duration_seconds', 'Latency of internal operations',
+                              ('operation',))
+
+
+class timed:
+    """计时上下文：with timed('face_detect'): ..."""
+
+    def __init__(self, operation):
+        self.labels = (operation,)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        operation_latency.observe(self.labels, time.perf_counter() - self.start)
+        return False
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if route not in METRICS_SKIP_ROUTES and 'request_start' in g:
+        elapsed = time.perf_counter() - g.request_start
+        request_latency.observe((route, request.method), elapsed)
+        request_count.inc((route, request.method, str(response.status_code)))
+    return response
+
+
 # === 加载已知人脸 ===
+# 人脸模型（dlib）和已知人脸编码按需加载：第一次调用 /upload_photo 时才加载，
+# 用 gunicorn 多进程部署时由 preload() 在主进程加载一次，fork 后各 worker 写时复制共享。
 known_face_encodings = []
 known_face_names = []
-
-for filename in os.listdir(KNOWN_FACES_DIR):
-    if filename.endswith(('.jpg', '.png')):
-        path = os.path.join(KNOWN_FACES_DIR, filename)
-        image = face_recognition.load_image_file(path)
-        encodings = face_recognition.face_encodings(image)
-        if encodings:
-            known_face_encodings.append(encodings[0])
-            known_face_names.append(os.path.splitext(filename)[0])
-        else:
-            print(f"No face found in {filename}, skipped.")
+face_recognition = None
+face_lock = threading.Lock()
+
+
+def load_known_faces():
+    global face_recognition
+    if face_recognition is not None:
+        return face_recognition
+
+    with face_lock:
+        if face_recognition is None:
+            with timed('face_model_load'):
+                import face_recognition as fr
+
+                # 先在局部列表里加载完，全部成功后再一次性写入全局，
+                # 中途出错时全局保持为空，下次调用重新加载也不会重复
+                encodings_list, names_list = [], []
+                for filename in os.listdir(KNOWN_FACES_DIR):
+                    if filename.endswith(('.jpg', '.png')):
+                        path = os.path.join(KNOWN_FACES_DIR, filename)
+                        image = fr.load_image_file(path)
+                        encodings = fr.face_encodings(image)
+                        if encodings:
+                            encodings_list.append(encodings[0])
+                            names_list.append(os.path.splitext(filename)[0])
+                        else:
+                            logger.warning("No face found in %s, skipped.", filename)
+            known_face_encodings[:] = encodings_list
+            known_face_names[:] = names_list
+            face_recognition = fr
+            logger.info("Loaded %d known faces", len(known_face_encodings))
+    return face_recognition
 
 # === 上传识别人脸接口 ===
 @app.route('/upload_photo', methods=['POST'])
@@ -39,24 +241,31 @@ def upload_photo():
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     file.save(filepath)
 
-    image = face_recognition.load_image_file(filepath)
-    locations = face_recognition.face_locations(image)
-    encodings = face_recognition.face_encodings(image, locations)
+    fr = load_known_faces()
+    image = fr.load_image_file(filepath)
+    with timed('face_detect'):
+        locations = fr.face_locations(image)
+    with timed('face_encode'):
+        encodings = fr.face_encodings(image, locations)
 
     results = []
-    for encoding, location in zip(encodings, locations):
-        matches = face_recognition.compare_faces(known_face_encodings, encoding)
-        name = "Unknown"
-        if True in matches:
-            name = known_face_names[matches.index(True)]
-        results.append({'name': name, 'location': location})
+    with timed('face_match'):
+        for encoding, location in zip(encodings, locations):
+            matches = fr.compare_faces(known_face_encodings, encoding)
+            name = "Unknown"
+            if True in matches:
+                name = known_face_names[matches.index(True)]
+            results.append({'name': name, 'location': location})
 
     return jsonify({'faces_detected': len(results), 'results': results})
 
 # === 加载环境变量 ===
-load_dotenv()
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY")
-print("当前 API Key 为:", DEEPSEEK_API_KEY)
+DEEPSEEK_API_URL = os.environ.get("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
+if DEEPSEEK_API_KEY:
+    logger.info("DEEPSEEK_API_KEY loaded")
+else:
+    logger.warning("DEEPSEEK_API_KEY is not set, /chat will fail")
 
 
 # 加载标志
@@ -69,7 +278,7 @@ def load_pretrained_prompt_if_needed():
         return
 
     try:
-        print("🧠 正在首次加载家居数据（仅一次）...")
+        logger.info("🧠 正在首次加载家居数据（仅一次）...")
         res = req.get("http://localhost:5000/data/export", timeout=5)
         if res.status_code == 200:
             lines = res.text.strip().splitlines()
@@ -80,9 +289,9 @@ def load_pretrained_prompt_if_needed():
                 "你已经掌握这些数据，请根据它们回答用户问题。"
             )
             pretrained_prompt_loaded = True
-            print("✅ Prompt 加载完成。")
+            logger.info("✅ Prompt 加载完成。")
     except Exception as e:
-        print("⚠️ Prompt 加载失败：", e)
+        logger.warning("⚠️ Prompt 加载失败：%s", e)
 
 
 # === AI 聊天接口 ===
@@ -110,7 +319,8 @@ def chat():
     }
 
     try:
-        response = req.post("https://api.deepseek.com/v1/chat/completions", headers=headers, json=payload)
+        with timed('llm_request'):
+            response = req.post(DEEPSEEK_API_URL, headers=headers, json=payload)
         response.raise_for_status()
         data = response.json()
         ai_reply = data["choices"][0]["message"]["content"]
@@ -132,9 +342,244 @@ db_config = {
     'charset': 'utf8mb4'
 }
 
+
+class TimedCursorMixin:
+    """execute 计入 db_execute 耗时。
+
+    pymysql 的 executemany 内部也是逐条或分块调用 execute，所以只计 execute，
+    每次记录对应一次实际发往数据库的语句，不会重复计数。
+    """
+
+    def execute(self, query, args=None):
+        with timed('db_execute'):
+            return super().execute(query, args)
+
+
+class TimedCursor(TimedCursorMixin, pymysql.cursors.Cursor):
+    pass
+
+
+class TimedDictCursor(TimedCursorMixin, pymysql.cursors.DictCursor):
+    pass
+
+
+def db_connect():
+    with timed('db_connect'):
+        return pymysql.connect(cursorclass=TimedCursor, **db_config)
+
+# === 通用表 CRUD 引擎 ===
+# 表名 -> 主键列。只有登记在这里的表才会被读写，
+# 列信息首次使用时从 information_schema 读取一次并缓存，之后请求字段都按它校验。
+CRUD_TABLES = {
+    'device_data': 'device_data_id',
+    'device': 'device_id',
+    'command_log': 'command_log_id',
+    'alarm_event': 'alarm_event_id',
+    'face_whitelist': 'face_whitelist_id',
+    'emergency_contact': 'emergency_contact_id',
+}
+
+INT_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint', 'bit'}
+FLOAT_TYPES = {'float', 'double', 'decimal', 'numeric', 'real'}
+STR_TYPES = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext', 'enum', 'set'}
+DATETIME_TYPES = {'datetime', 'timestamp'}
+# MySQL TIME 可以表示时长，小时可超过 24，也可以为负
+TIME_PATTERN = re.compile(r'-?\d{1,3}:\d{2}(:\d{2}(\.\d{1,6})?)?')
+
+# 表名 -> {列名: 数据类型}，按建表时的列顺序
+table_schemas = {}
+schema_lock = threading.Lock()
+
+
+class PayloadError(ValueError):
+    """请求体与表结构不符，接口返回 400"""
+
+
+def get_table_schema(table):
+    schema = table_schemas.get(table)
+    if schema is not None:
+        return schema
+
+    with schema_lock:
+        if table not in table_schemas:
+            conn = db_connect()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+                        "WHERE TABLE_SCHEMA=%s AND TABLE_NAME=%s ORDER BY ORDINAL_POSITION",
+                        (db_config['database'], table)
+                    )
+                    columns = cursor.fetchall()
+            finally:
+                conn.close()
+            if not columns:
+                raise RuntimeError(f"Table {table} not found in {db_config['database']}")
+            table_schemas[table] = {name: data_type.lower() for name, data_type in columns}
+    return table_schemas[table]
+
+
+def load_table_schemas():
+    """启动时预热所有登记表的列信息"""
+    for table in CRUD_TABLES:
+        try:
+            get_table_schema(table)
+        except Exception as e:
+            logger.warning("⚠️ 读取表结构失败：%s", e, extra={'fields': {'table': table}})
+
+
+def coerce_value(column, data_type, value):
+    if value is None:
+        return None
+    try:
+        if data_type in INT_TYPES:
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError
+            return int(value)
+        if data_type in FLOAT_TYPES:
+            return float(value)
+        if data_type in STR_TYPES:
+            if isinstance(value, (dict, list)):
+                return json.dumps(value, ensure_ascii=False)
+            return str(value)
+        if data_type == 'json' and not isinstance(value, str):
+            return json.dumps(value, ensure_ascii=False)
+        # 时间类型在这里解析，避免非法值进到 MySQL 才报错、让整批写入失败
+        if data_type in DATETIME_TYPES:
+            if isinstance(value, datetime):
+                return value
+            parsed = datetime.fromisoformat(value)
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone().replace(tzinfo=None)
+            return parsed
+        if data_type == 'date':
+            return value if isinstance(value, date) else date.fromisoformat(value)
+        if data_type == 'time':
+            if not TIME_PATTERN.fullmatch(value):
+                raise ValueError
+            return value
+    except (TypeError, ValueError):
+        raise PayloadError(f"Invalid value for {column} ({data_type}): {value!r}")
+    return value
+
+
+def prepare_row(table, payload):
+    """按表结构校验字段并转换类型，返回按列顺序排列的 dict"""
+    if not isinstance(payload, dict) or not payload:
+        raise PayloadError('Payload must be a non-empty JSON object')
+
+    schema = get_table_schema(table)
+    unknown = [k for k in payload if k not in schema]
+    if unknown:
+        raise PayloadError(f"Unknown columns for {table}: {', '.join(unknown)}")
+
+    return {c: coerce_value(c, t, payload[c]) for c, t in schema.items() if c in payload}
+
+
+# 预编译 SQL 模板：表名、列名都来自 CRUD_TABLES 和表结构，不直接拼接请求里的 key
+@lru_cache(maxsize=None)
+def select_all_sql(table):
+    return f"SELECT * FROM {table}"
+
+
+@lru_cache(maxsize=None)
+def select_by_id_sql(table):
+    return f"SELECT * FROM {table} WHERE {CRUD_TABLES[table]}=%s"
+
+
+@lru_cache(maxsize=256)
+def insert_sql(table, columns):
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+
+@lru_cache(maxsize=256)
+def update_sql(table, columns):
+    updates = ', '.join(f"{c}=%s" for c in columns)
+    return f"UPDATE {table} SET {updates} WHERE {CRUD_TABLES[table]}=%s"
+
+
+@lru_cache(maxsize=256)
+def bulk_update_sql(table, column_counts, id_count):
+    """column_counts 为 ((列名, 出现该列的行数), ...)，每列生成一个 CASE 主键 WHEN ... 分支"""
+    pk = CRUD_TABLES[table]
+    updates = ', '.join(
+        f"{c}=CASE {pk} {' '.join(['WHEN %s THEN %s'] * n)} ELSE {c} END"
+        for c, n in column_counts
+    )
+    return f"UPDATE {table} SET {updates} WHERE {pk} IN ({', '.join(['%s'] * id_count)})"
+
+
+@lru_cache(maxsize=256)
+def delete_sql(table, id_count):
+    if id_count == 1:
+        return f"DELETE FROM {table} WHERE {CRUD_TABLES[table]}=%s"
+    return f"DELETE FROM {table} WHERE {CRUD_TABLES[table]} IN ({', '.join(['%s'] * id_count)})"
+
+
+def insert_rows(table, rows, conn=None):
+    """批量插入已校验的行。列相同的行合并为一条多值 INSERT，全部在同一事务内提交。
+
+    传入 conn 时由调用方负责提交和关闭。
+    """
+    if not rows:
+        raise PayloadError('Nothing to insert')
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(tuple(row.values()))
+
+    own_conn = conn is None
+    if own_conn:
+        conn = db_connect()
+    try:
+        with conn.cursor() as cursor:
+            for columns, values in groups.items():
+                cursor.executemany(insert_sql(table, columns), values)
+        if own_conn:
+            conn.commit()
+    except Exception:
+        if own_conn:
+            conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+    return len(rows)
+
+
+def update_rows(table, rows):
+    """批量更新已校验的行（每行必须带主键），合并为一条 UPDATE ... CASE 语句"""
+    pk = CRUD_TABLES[table]
+    if not rows:
+        raise PayloadError('Nothing to update')
+
+    ids = []
+    changes = {}
+    for row in rows:
+        if row.get(pk) is None:
+            raise PayloadError(f"Each row must include {pk}")
+        ids.append(row[pk])
+        for column, value in row.items():
+            if column != pk:
+                changes.setdefault(column, []).extend((row[pk], value))
+    if not changes:
+        raise PayloadError('No columns to update')
+
+    column_counts = tuple((c, len(v) // 2) for c, v in changes.items())
+    values = [v for c in changes for v in changes[c]] + ids
+
+    conn = db_connect()
+    try:
+        with conn.cursor() as cursor:
+            updated = cursor.execute(bulk_update_sql(table, column_counts, len(ids)), values)
+        conn.commit()
+    finally:
+        conn.close()
+    return updated
+
 # 全局缓存：按 device_id 缓存未合并数据
 cache_data = {}
-from datetime import datetime
+from datetime import date, datetime, timezone
 import csv
 import os
 
@@ -145,14 +590,14 @@ os.makedirs(ARCHIVE_FOLDER, exist_ok=True)
 
 def export_and_clear_device_data():
     try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        conn = db_connect()
+        with conn.cursor(TimedDictCursor) as cursor:
             cursor.execute("SELECT COUNT(*) AS total FROM device_data")
             row_count = cursor.fetchone()["total"]
             if row_count < MAX_ROWS:
                 return
 
-            print(f"⚠️ 数据量达到 {row_count} 条，导出 CSV 并清空！", flush=True)
+            logger.warning("⚠️ 数据量达到 %d 条，导出 CSV 并清空！", row_count)
 
             cursor.execute("SELECT * FROM device_data ORDER BY created_at ASC")
             rows = cursor.fetchall()
@@ -167,93 +612,596 @@ def export_and_clear_device_data():
                     writer.writeheader()
                     writer.writerows(rows)
 
-                print(f"✅ 已备份至 {full_path}", flush=True)
+                logger.info("✅ 已备份至 %s", full_path)
 
             cursor.execute("TRUNCATE TABLE device_data")
             conn.commit()
-            print("✅ 已清空 device_data 表", flush=True)
+            logger.info("✅ 已清空 device_data 表")
 
         conn.close()
     except Exception as e:
-        print("❌ 导出并清空失败：", e, flush=True)
+        logger.error("❌ 导出并清空失败：%s", e)
+
+
+# === 实时推送（SSE） ===
+# 设备数据、告警写库后由这里扇出给 /stream 的订阅者，客户端不必再轮询 /data/latest、/alarm_event。
+# 每个事件只序列化一次；订阅者队列满时丢弃该订阅者的新事件，不阻塞写入路径。
+# 每个 /stream 连接在断开前一直占用一个服务线程，SSE_MAX_SUBSCRIBERS（环境变量可配）
+# 限制本进程的连接数，超过返回 503；它必须明显小于服务线程数，给其余接口留出线程。
+SSE_QUEUE_SIZE = 100
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', '8'))
+
+
+class EventHub:
+    """进程内发布/订阅中心，按 device_id 过滤"""
+
+    def __init__(self, queue_size=SSE_QUEUE_SIZE, max_subscribers=SSE_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, device_ids=None):
+        """返回订阅队列；连接数已满时返回 None"""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            self.subscribers[q] = frozenset(device_ids) if device_ids else None
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.pop(q, None)
+
+    def publish(self, event, device_id, data):
+        with self.lock:
+            targets = [q for q, ids in self.subscribers.items() if ids is None or device_id in ids]
+        if not targets:
+            return
+
+        message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+        for q in targets:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                pass
+
+
+event_hub = EventHub()
+
+
+def publish_rows(event, rows, device_id=None):
+    for row in rows:
+        if 'device_id' not in row and device_id is not None:
+            row = {'device_id': device_id, **row}
+        event_hub.publish(event, row.get('device_id'), row)
+
+
+@app.route('/stream', methods=['GET'])
+def stream_events():
+    device_ids = [d for d in request.args.get('device_id', '').split(',') if d]
+    q = event_hub.subscribe(device_ids)
+    if q is None:
+        return jsonify({'error': 'Too many stream subscribers'}), 503
+
+    def generate():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    yield q.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            event_hub.unsubscribe(q)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# === 实时告警规则引擎 ===
+# 每条合并入库的设备数据都在这里按规则判定，命中即推送 alarm_event 事件，
+# 告警行攒批后由后台线程写入 alarm_event 表。规则字段：
+#   name      告警类型，写入 alarm_type
+#   field     判定的上报字段
+#   above / below / equals   阈值条件（三选一）
+#   rise      变化率条件：当前值比最近 window 条里的最小值高出 rise 以上
+#   window    变化率回看的条数，默认 5
+#   debounce  连续命中多少条才触发，默认 1
+# 告警触发后保持激活状态，条件解除前同一设备同一规则不会重复报警。
+# 可通过环境变量 ALARM_RULES_FILE 指向 JSON 文件（规则数组）覆盖默认规则。
+DEFAULT_ALARM_RULES = [
+    {'name': 'smoke', 'field': 'smoke', 'above': 300, 'debounce': 2},
+    {'name': 'comb', 'field': 'comb', 'above': 300, 'debounce': 2},
+    {'name': 'high_temperature', 'field': 'temperature_indoor', 'above': 50, 'debounce': 2},
+    {'name': 'temperature_rise', 'field': 'temperature_indoor', 'rise': 8, 'window': 5},
+    {'name': 'intrusion', 'field': 'sr501_state', 'equals': 1, 'debounce': 3},
+]
+ALARM_BATCH_SIZE = 50
+ALARM_FLUSH_SECONDS = 1.0
+# 写库失败的批次按指数退避重试，超过次数后丢弃并记录错误
+ALARM_MAX_RETRIES = 5
+ALARM_RETRY_DELAY = 1.0
+ALARM_RETRY_MAX_DELAY = 30.0
+
+
+ALARM_CONDITIONS = ('above', 'below', 'equals', 'rise')
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_alarm_rule(rule):
+    """规则不合法时抛出 ValueError"""
+    if not isinstance(rule, dict):
+        raise ValueError('rule must be an object')
+    for key in ('name', 'field'):
+        if not isinstance(rule.get(key), str) or not rule[key]:
+            raise ValueError(f"missing {key}")
+    conditions = [c for c in ALARM_CONDITIONS if c in rule]
+    if len(conditions) != 1:
+        raise ValueError(f"needs exactly one of {', '.join(ALARM_CONDITIONS)}")
+    if not is_number(rule[conditions[0]]):
+        raise ValueError(f"{conditions[0]} must be a number")
+    for key in ('window', 'debounce'):
+        if key in rule and (not isinstance(rule[key], int) or isinstance(rule[key], bool) or rule[key] < 1):
+            raise ValueError(f"{key} must be a positive integer")
+
+
+def load_alarm_rules():
+    path = os.environ.get('ALARM_RULES_FILE')
+    if not path:
+        return DEFAULT_ALARM_RULES
+    try:
+        with open(path, encoding='utf-8') as f:
+            rules = json.load(f)
+        if not isinstance(rules, list):
+            raise ValueError('rules file must contain a JSON array')
+    except Exception as e:
+        logger.warning("⚠️ 告警规则 %s 加载失败，使用默认规则：%s", path, e)
+        return DEFAULT_ALARM_RULES
+
+    valid = []
+    for index, rule in enumerate(rules):
+        try:
+            validate_alarm_rule(rule)
+        except ValueError as e:
+            logger.warning("⚠️ 跳过第 %d 条告警规则 %s：%s", index, rule, e)
+            continue
+        valid.append(rule)
+    return valid
+
+
+class AlarmEngine:
+    """按设备维护滚动状态并判定告警规则"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        # 每个字段的环形缓冲长度取所有相关规则里最大的 window
+        self.history_size = {}
+        for rule in rules:
+            size = rule.get('window', 5) + 1 if 'rise' in rule else 1
+            self.history_size[rule['field']] = max(size, self.history_size.get(rule['field'], 1))
+        # device_id -> {'history': {field: deque}, 'hits': {name: n}, 'active': set()}
+        self.devices = {}
+        self.lock = threading.Lock()
+
+    def check(self, rule, value, history):
+        if 'above' in rule:
+            return value > rule['above']
+        if 'below' in rule:
+            return value < rule['below']
+        if 'equals' in rule:
+            return value == rule['equals']
+        if 'rise' in rule:
+            return len(history) > 1 and value - min(history) >= rule['rise']
+        return False
+
+    def evaluate(self, device_id, row):
+        """判定一条合并后的上报，返回本次新触发的告警列表"""
+        alarms = []
+        with self.lock:
+            state = self.devices.setdefault(device_id, {'history': {}, 'hits': {}, 'active': set()})
+            for field, size in self.history_size.items():
+                value = row.get(field)
+                if value is not None:
+                    state['history'].setdefault(field, deque(maxlen=size)).append(value)
+
+            for rule in self.rules:
+                value = row.get(rule['field'])
+                if value is None:
+                    continue
+                name = rule['name']
+                if not self.check(rule, value, state['history'][rule['field']]):
+                    state['hits'][name] = 0
+                    state['active'].discard(name)
+                    continue
+
+                state['hits'][name] = state['hits'].get(name, 0) + 1
+                if name in state['active'] or state['hits'][name] < rule.get('debounce', 1):
+                    continue
+                state['active'].add(name)
+                alarms.append({
+                    'device_id': device_id,
+                    'alarm_type': name,
+                    'alarm_value': value,
+                    'message': f"{rule['field']}={value} 触发规则 {name}",
+                    'created_at': row.get('created_at') or datetime.now(),
+                })
+        return alarms
+
+
+class AlarmWriter:
+    """告警攒批写库：满 ALARM_BATCH_SIZE 条或每 ALARM_FLUSH_SECONDS 秒写一次。
+    写库失败的批次留在后台线程里退避重试；进程退出时 close() 把剩余告警写完。
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        # 后台线程退出时还没写成功的批次，交给 close() 处理
+        self.leftover = []
+
+    def put(self, alarms):
+        for alarm in alarms:
+            self.queue.put(alarm)
+        with self.lock:
+            # 后台线程在首次有告警时才启动，fork 出的子进程里也会各自重新启动
+            if self.stopping.is_set():
+                return
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='alarm-writer', daemon=True)
+                self.thread.start()
+
+    def collect(self):
+        """取一批告警，没有告警时每 ALARM_FLUSH_SECONDS 秒返回一次空列表以便检查退出"""
+        try:
+            batch = [self.queue.get(timeout=ALARM_FLUSH_SECONDS)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + ALARM_FLUSH_SECONDS
+        while len(batch) < ALARM_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        batch, failures = [], 0
+        while not self.stopping.is_set():
+            if not batch:
+                batch = self.collect()
+                if not batch:
+                    continue
+            if self.flush(batch):
+                batch, failures = [], 0
+                continue
+
+            failures += 1
+            if failures > ALARM_MAX_RETRIES:
+                logger.error("❌ %d 条告警重试 %d 次仍写入失败，已丢弃", len(batch), ALARM_MAX_RETRIES)
+                batch, failures = [], 0
+                continue
+            self.stopping.wait(min(ALARM_RETRY_MAX_DELAY, ALARM_RETRY_DELAY * 2 ** (failures - 1)))
+        self.leftover = batch
+
+    def flush(self, batch):
+        """写入一批告警，成功返回 True"""
+        try:
+            # alarm_event 表结构以数据库为准，只写入表里存在的列
+            schema = get_table_schema('alarm_event')
+            rows = [prepare_row('alarm_event', {k: v for k, v in alarm.items() if k in schema})
+                    for alarm in batch]
+            insert_rows('alarm_event', rows)
+        except Exception as e:
+            logger.error("❌ 写入 %d 条告警失败：%s", len(batch), e)
+            return False
+        return True
+
+    def close(self, timeout=5):
+        """停止后台线程，把重试中和队列里剩余的告警同步写一次"""
+        with self.lock:
+            self.stopping.set()
+            thread = self.thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        batch, self.leftover = self.leftover, []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self.flush(batch)
+
+
+alarm_engine = AlarmEngine(load_alarm_rules())
+alarm_writer = AlarmWriter()
+atexit.register(alarm_writer.close)
+
+
+def detect_alarms(rows, device_id=None):
+    """对刚入库的设备数据做告警判定：立即推送，异步批量写库"""
+    alarms = []
+    for row in rows:
+        alarms.extend(alarm_engine.evaluate(row.get('device_id', device_id), row))
+    if alarms:
+        publish_rows('alarm_event', alarms)
+        alarm_writer.put(alarms)
+
+
+def after_commit(event, rows):
+    """写库提交后的推送与告警判定。数据已经入库，这里出错只记日志，不影响接口返回成功"""
+    try:
+        publish_rows(event, rows)
+        if event == 'device_data':
+            detect_alarms(rows)
+    except Exception as e:
+        logger.exception("❌ 推送或告警判定失败: %s", e, extra={'fields': {'event': event, 'rows': len(rows)}})
+
+
+# 设备上报的属性分两半：传感器一半、家居状态一半，两半都到齐后合并成一行入库
+SENSOR_KEYS = {
+    "temperature_indoor", "humidity_indoor", "smoke", "comb",
+    "light", "current", "voltage", "power", "sr501_state", "beep_state"
+}
+HOME_KEYS = {
+    "door_state", "airConditioner_state", "curtain_percent", "led_lightness_color", "automation_mode_scene"
+}
+
+
+def parse_iot_report(data):
+    """解析 notify_data 上报，返回 (device_id, sensor_data, home_data, event_time)"""
+    if not isinstance(data, dict):
+        raise PayloadError('Report must be a JSON object')
+
+    notify = data.get('notify_data', {})
+    if not isinstance(notify, dict):
+        raise PayloadError('notify_data must be a JSON object')
+    header = notify.get('header', {})
+    body = notify.get('body', {})
+    if not isinstance(header, dict) or not isinstance(body, dict):
+        raise PayloadError('header and body must be JSON objects')
+
+    # device_id 用作缓存和锁的键，统一转成非空字符串
+    device_id = header.get('device_id', 'unknown_device')
+    if isinstance(device_id, bool) or not isinstance(device_id, (str, int)):
+        raise PayloadError(f"Invalid device_id: {device_id!r}")
+    device_id = str(device_id)
+    services = body.get('services', [])
+    if not isinstance(services, list) or not all(isinstance(s, dict) for s in services):
+        raise PayloadError('services must be a list of JSON objects')
+
+    if not device_id or not services:
+        raise PayloadError('Missing device_id or services')
+
+    service = services[0]
+    props = service.get('properties', {})
+    if not isinstance(props, dict):
+        raise PayloadError('properties must be a JSON object')
+    if not props:
+        raise PayloadError('Missing properties')
+
+    sensor_data = {k: v for k, v in props.items() if k in SENSOR_KEYS}
+    home_data = {k: v for k, v in props.items() if k in HOME_KEYS}
+    return device_id, sensor_data, home_data, parse_event_time(service.get('event_time'))
+
+
+def parse_event_time(value):
+    """设备上报时间（UTC，格式 20240407T103325Z）转成本地时间；没有则返回 None"""
+    if not value:
+        return None
+    try:
+        utc_time = datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        raise PayloadError(f"Invalid event_time: {value!r}")
+    return utc_time.astimezone().replace(tzinfo=None)
+
+
+def merge_iot_report(device_cache, sensor_data, home_data):
+    """把一次上报写入该设备的缓存，两半都到齐时返回合并结果，否则返回 None"""
+    if sensor_data:
+        device_cache['sensor'] = sensor_data
+    if home_data:
+        device_cache['home'] = home_data
+
+    if 'sensor' in device_cache and 'home' in device_cache:
+        return {**device_cache['sensor'], **device_cache['home']}
+    return None
+
+
+# 每个设备一把锁：单条上报与批量上报对同一设备的合并、写库、缓存回写串行进行
+cache_locks = {}
+cache_locks_guard = threading.Lock()
+
+
+def device_cache_lock(device_id):
+    with cache_locks_guard:
+        return cache_locks.setdefault(device_id, threading.Lock())
 
 
 @app.route('/iot-data', methods=['POST'])
 def receive_iot_data():
     try:
         data = request.get_json()
-        print("📦 接收到设备数据:", data, flush=True)
+        logger.debug("📦 接收到设备数据: %s", data)
 
-        notify = data.get('notify_data', {})
-        device_id = notify.get('header', {}).get('device_id', 'unknown_device')
-        services = notify.get('body', {}).get('services', [])
+        try:
+            device_id, sensor_data, home_data, _ = parse_iot_report(data)
+        except PayloadError as e:
+            return jsonify({'error': str(e)}), 400
 
-        if not device_id or not services:
-            return jsonify({'error': 'Missing device_id or services'}), 400
+        with device_cache_lock(device_id):
+            # 初始化缓存结构
+            if device_id not in cache_data:
+                cache_data[device_id] = {}
 
-        service = services[0]
-        props = service.get('properties', {})
-        if not props:
-            return jsonify({'error': 'Missing properties'}), 400
+            merged = merge_iot_report(cache_data[device_id], sensor_data, home_data)
+            logger.debug("🔄 当前缓存: %s", cache_data[device_id], extra={'fields': {'device_id': device_id}})
 
-        # 初始化缓存结构
-        if device_id not in cache_data:
-            cache_data[device_id] = {}
+            if merged is None:
+                return jsonify({
+                    'status': 'waiting',
+                    'cached_keys': list(cache_data[device_id].keys())
+                })
 
-        sensor_keys = {
-            "temperature_indoor", "humidity_indoor", "smoke", "comb",
-            "light", "current", "voltage", "power", "sr501_state", "beep_state"
-        }
-        home_keys = {
-            "door_state", "airConditioner_state", "curtain_percent", "led_lightness_color", "automation_mode_scene"
-        }
+            logger.debug("✅ 数据合并并写入数据库: %s", merged, extra={'fields': {'device_id': device_id}})
 
-        sensor_data = {k: v for k, v in props.items() if k in sensor_keys}
-        home_data = {k: v for k, v in props.items() if k in home_keys}
+            keys = list(merged.keys())
 
-        if sensor_data:
-            cache_data[device_id]['sensor'] = sensor_data
-        if home_data:
-            cache_data[device_id]['home'] = home_data
+            try:
+                row = prepare_row('device_data', {
+                    **merged, 'device_id': device_id, 'created_at': datetime.now()
+                })
+                insert_rows('device_data', [row])
+            except PayloadError as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as db_error:
+                logger.error("❌ 写入数据库失败: %s", db_error, extra={'fields': {'device_id': device_id}})
+                return jsonify({'error': str(db_error)}), 500
 
-        print(f"🔄 当前缓存: {cache_data[device_id]}", flush=True)
+            del cache_data[device_id]
 
-        if 'sensor' in cache_data[device_id] and 'home' in cache_data[device_id]:
-            merged = {**cache_data[device_id]['sensor'], **cache_data[device_id]['home']}
-            print(f"✅ 数据合并并写入数据库: {merged}", flush=True)
+            # 仍持有设备锁时做告警判定，保证同一设备的数据按入库顺序进入滚动状态
+            after_commit('device_data', [row])
 
-            keys = list(merged.keys())
-            values = [merged[k] for k in keys]
-            columns = ', '.join(keys + ['created_at'])
-            placeholders = ', '.join(['%s'] * len(keys) + ['%s'])
-            values.append(datetime.now())
+        # ✅ 插入后触发导出+清空
+        export_and_clear_device_data()
+
+        return jsonify({'status': 'success', 'inserted': keys})
+
+    except Exception as e:
+        logger.exception("❌ 接口异常: %s", e)
+        return jsonify({'error': str(e)}), 500
 
-            sql = f"INSERT INTO device_data ({columns}) VALUES ({placeholders})"
 
+# === 批量上报接口 ===
+# 网关离线缓存的数据恢复联网后一次性补传：请求体为 JSON 数组，
+# 或 Content-Type 为 application/x-ndjson 的逐行 JSON。整批在同一事务内写入，
+# 响应里按顺序给出每条记录的处理结果。
+BULK_MAX_RECORDS = 20000
+BULK_MAX_BYTES = 32 * 1024 * 1024
+NDJSON_MIMETYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl'}
+
+
+def read_bulk_records():
+    """边读边检查条数和字节数，超限立即拒绝，不把超大请求体整个读进内存"""
+    if request.content_length is not None and request.content_length > BULK_MAX_BYTES:
+        raise PayloadError(f"Payload too large: {request.content_length} > {BULK_MAX_BYTES} bytes")
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        records = []
+        size = 0
+        for line_no, line in enumerate(request.stream, start=1):
+            size += len(line)
+            if size > BULK_MAX_BYTES:
+                raise PayloadError(f"Payload too large: > {BULK_MAX_BYTES} bytes")
+            line = line.strip()
+            if not line:
+                continue
+            if len(records) >= BULK_MAX_RECORDS:
+                raise PayloadError(f"Batch too large: > {BULK_MAX_RECORDS} records")
             try:
-                conn = pymysql.connect(**db_config)
-                with conn.cursor() as cursor:
-                    cursor.execute(sql, values)
-                conn.commit()
-                conn.close()
+                records.append(json.loads(line))
+            except ValueError as e:
+                raise PayloadError(f"Invalid JSON on line {line_no}: {e}")
+    else:
+        if not request.is_json:
+            raise PayloadError('Bulk payload must be a JSON array or NDJSON')
+        body = request.stream.read(BULK_MAX_BYTES + 1)
+        if len(body) > BULK_MAX_BYTES:
+            raise PayloadError(f"Payload too large: > {BULK_MAX_BYTES} bytes")
+        try:
+            records = json.loads(body)
+        except ValueError as e:
+            raise PayloadError(f"Invalid JSON: {e}")
+        if not isinstance(records, list):
+            raise PayloadError('Bulk payload must be a JSON array or NDJSON')
+
+    if not records:
+        raise PayloadError('Empty batch')
+    if len(records) > BULK_MAX_RECORDS:
+        raise PayloadError(f"Batch too large: {len(records)} > {BULK_MAX_RECORDS}")
+    return records
+
+
+@app.route('/iot-data/bulk', methods=['POST'])
+def receive_iot_data_bulk():
+    try:
+        records = read_bulk_records()
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
 
-                # ✅ 插入后触发导出+清空
-                export_and_clear_device_data()
+    try:
+        parsed = []
+        results = [None] * len(records)
+        for index, record in enumerate(records):
+            try:
+                parsed.append((index, *parse_iot_report(record)))
+            except PayloadError as e:
+                results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+
+        rows = []
+        # 按固定顺序拿到本批所有设备的锁，合并、写库、回写缓存期间其他上报不会插进来
+        with ExitStack() as stack:
+            for device_id in sorted({item[1] for item in parsed}, key=str):
+                stack.enter_context(device_cache_lock(device_id))
+
+            # 在缓存副本上按顺序合并，整批写库成功后才回写全局缓存
+            pending = {}
+            for index, device_id, sensor_data, home_data, event_time in parsed:
+                if device_id not in pending:
+                    pending[device_id] = dict(cache_data.get(device_id, {}))
+                device_cache = dict(pending[device_id])
+                merged = merge_iot_report(device_cache, sensor_data, home_data)
+                if merged is None:
+                    pending[device_id] = device_cache
+                    results[index] = {'index': index, 'device_id': device_id, 'status': 'waiting',
+                                      'cached_keys': list(device_cache.keys())}
+                    continue
+                try:
+                    rows.append(prepare_row('device_data', {
+                        **merged, 'device_id': device_id, 'created_at': event_time or datetime.now()
+                    }))
+                except PayloadError as e:
+                    results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+                    continue
+                pending[device_id] = {}
+                results[index] = {'index': index, 'device_id': device_id, 'status': 'success',
+                                  'inserted': list(merged.keys())}
 
-            except Exception as db_error:
-                print("❌ 写入数据库失败:", db_error, flush=True)
-                return jsonify({'error': str(db_error)}), 500
+            if rows:
+                try:
+                    insert_rows('device_data', rows)
+                except Exception as db_error:
+                    logger.error("❌ 批量写入数据库失败: %s", db_error, extra={'fields': {'rows': len(rows)}})
+                    return jsonify({'error': str(db_error)}), 500
 
-            del cache_data[device_id]
-            return jsonify({'status': 'success', 'inserted': keys})
+            for device_id, device_cache in pending.items():
+                if device_cache:
+                    cache_data[device_id] = device_cache
+                else:
+                    cache_data.pop(device_id, None)
+
+            after_commit('device_data', rows)
 
-        return jsonify({
-            'status': 'waiting',
-            'cached_keys': list(cache_data[device_id].keys())
-        })
+        if rows:
+            export_and_clear_device_data()
+
+        return jsonify({'status': 'success', 'received': len(records),
+                        'inserted': len(rows), 'results': results})
 
     except Exception as e:
-        print("❌ 接口异常:", e, flush=True)
+        logger.exception("❌ 接口异常: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -262,29 +1210,45 @@ def receive_iot_data():
 def insert_data():
     try:
         payload = request.get_json()
-        keys = list(payload.keys())
-        values = [payload[k] for k in keys]
+        insert_rows('device_data', [prepare_row('device_data', payload)])
 
-        placeholders = ', '.join(['%s'] * len(keys))
-        columns = ', '.join(keys)
+        return jsonify({'status': 'inserted', 'fields': list(payload.keys())}), 201
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        sql = f"INSERT INTO device_data ({columns}) VALUES ({placeholders})"
+@app.route('/data/bulk', methods=['POST'])
+def insert_data_bulk():
+    try:
+        records = read_bulk_records()
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
 
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
-        conn.close()
+    try:
+        rows = []
+        results = []
+        for index, record in enumerate(records):
+            try:
+                rows.append(prepare_row('device_data', record))
+                results.append({'index': index, 'status': 'inserted'})
+            except PayloadError as e:
+                results.append({'index': index, 'status': 'error', 'error': str(e)})
+
+        if rows:
+            insert_rows('device_data', rows)
+            export_and_clear_device_data()
 
-        return jsonify({'status': 'inserted', 'fields': keys}), 201
+        return jsonify({'status': 'success', 'received': len(records),
+                        'inserted': len(rows), 'results': results}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/data', methods=['GET'])
 def get_all_data():
     try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        conn = db_connect()
+        with conn.cursor(TimedDictCursor) as cursor:
             cursor.execute("SELECT * FROM device_data ORDER BY created_at DESC")
             rows = cursor.fetchall()
         conn.close()
@@ -295,8 +1259,8 @@ def get_all_data():
 @app.route('/data/<int:id>', methods=['GET'])
 def get_data_by_id(id):
     try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        conn = db_connect()
+        with conn.cursor(TimedDictCursor) as cursor:
             cursor.execute("SELECT * FROM device_data WHERE device_data_id=%s", (id,))
             row = cursor.fetchone()
         conn.close()
@@ -310,27 +1274,26 @@ def get_data_by_id(id):
 @app.route('/data/<int:id>', methods=['PUT'])
 def update_data(id):
     try:
-        payload = request.get_json()
-        updates = ', '.join([f"{k}=%s" for k in payload])
-        values = list(payload.values())
+        row = prepare_row('device_data', request.get_json())
+        values = list(row.values())
         values.append(id)
 
-        sql = f"UPDATE device_data SET {updates} WHERE device_data_id=%s"
-
-        conn = pymysql.connect(**db_config)
+        conn = db_connect()
         with conn.cursor() as cursor:
-            cursor.execute(sql, values)
+            cursor.execute(update_sql('device_data', tuple(row)), values)
         conn.commit()
         conn.close()
 
         return jsonify({'status': 'updated', 'id': id})
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/data/<int:id>', methods=['DELETE'])
 def delete_data(id):
     try:
-        conn = pymysql.connect(**db_config)
+        conn = db_connect()
         with conn.cursor() as cursor:
             cursor.execute("DELETE FROM device_data WHERE device_data_id=%s", (id,))
         conn.commit()
@@ -342,8 +1305,8 @@ def delete_data(id):
 @app.route('/data/latest', methods=['GET'])
 def get_latest_data():
     try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        conn = db_connect()
+        with conn.cursor(TimedDictCursor) as cursor:
             cursor.execute("""
                 SELECT * FROM device_data 
                 ORDER BY created_at DESC 
@@ -366,8 +1329,8 @@ from flask import Response
 def export_data_as_csv():
     try:
         # 连接数据库并取最近100条数据
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        conn = db_connect()
+        with conn.cursor(TimedDictCursor) as cursor:
             cursor.execute("""
                 SELECT * FROM device_data 
                 ORDER BY created_at DESC 
@@ -400,115 +1363,43 @@ def export_data_as_csv():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# === device 表 CRUD 接口 ===
-
-@app.route('/device', methods=['POST'])
-def insert_device():
-    try:
-        payload = request.get_json()
-        keys = list(payload.keys())
-        values = [payload[k] for k in keys]
-
-        placeholders = ', '.join(['%s'] * len(keys))
-        columns = ', '.join(keys)
-        sql = f"INSERT INTO device ({columns}) VALUES ({placeholders})"
-
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'inserted', 'fields': keys}), 201
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/device', methods=['GET'])
-def get_all_device():
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM device")
-            rows = cursor.fetchall()
-        conn.close()
-        return jsonify(rows)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/device/<device_id>', methods=['GET'])
-def get_device_by_id(device_id):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM device WHERE device_id=%s", (device_id,))
-            row = cursor.fetchone()
-        conn.close()
-        return jsonify(row if row else {'error': 'Not found'})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/device/<device_id>', methods=['PUT'])
-def update_device(device_id):
-    try:
-        payload = request.get_json()
-        updates = ', '.join([f"{k}=%s" for k in payload])
-        values = list(payload.values())
-        values.append(device_id)
-
-        sql = f"UPDATE device SET {updates} WHERE device_id=%s"
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'updated', 'device_id': device_id})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
+# === device / command_log / alarm_event / face_whitelist / emergency_contact 表 CRUD 接口 ===
+# 五张表共用同一套处理逻辑，URL 与 endpoint 名称保持和原先逐表手写时一致：
+#   POST   /<table>          插入一条（JSON 对象）或批量插入（JSON 数组）
+#   GET    /<table>          查询全部
+#   PUT    /<table>          批量更新（JSON 数组，每条需带主键）
+#   DELETE /<table>          批量删除（主键数组或 {"ids": [...]}）
+#   GET    /<table>/<id>     按主键查询
+#   PUT    /<table>/<id>     按主键更新
+#   DELETE /<table>/<id>     按主键删除
 
-@app.route('/device/<device_id>', methods=['DELETE'])
-def delete_device(device_id):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM device WHERE device_id=%s", (device_id,))
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'deleted', 'device_id': device_id})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+# 插入后需要实时推送的表
+PUSH_TABLES = {'alarm_event'}
 
-# === command_log 表 CRUD 接口 ===
 
-@app.route('/command_log', methods=['POST'])
-def insert_command_log():
+def crud_insert(table):
     try:
         payload = request.get_json()
-        keys = list(payload.keys())
-        values = [payload[k] for k in keys]
-
-        placeholders = ', '.join(['%s'] * len(keys))
-        columns = ', '.join(keys)
-        sql = f"INSERT INTO command_log ({columns}) VALUES ({placeholders})"
-
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'inserted', 'fields': keys}), 201
+        rows = [prepare_row(table, item) for item in payload] if isinstance(payload, list) \
+            else [prepare_row(table, payload)]
+        insert_rows(table, rows)
+        if table in PUSH_TABLES:
+            after_commit(table, rows)
+
+        if isinstance(payload, list):
+            return jsonify({'status': 'inserted', 'count': len(rows)}), 201
+        return jsonify({'status': 'inserted', 'fields': list(payload.keys())}), 201
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/command_log', methods=['GET'])
-def get_all_command_log():
+def crud_get_all(table):
     try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM command_log")
+        conn = db_connect()
+        with conn.cursor(TimedDictCursor) as cursor:
+            cursor.execute(select_all_sql(table))
             rows = cursor.fetchall()
         conn.close()
         return jsonify(rows)
@@ -516,12 +1407,11 @@ def get_all_command_log():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/command_log/<int:command_log_id>', methods=['GET'])
-def get_command_log_by_id(command_log_id):
+def crud_get_by_id(table, row_id):
     try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM command_log WHERE command_log_id=%s", (command_log_id,))
+        conn = db_connect()
+        with conn.cursor(TimedDictCursor) as cursor:
+            cursor.execute(select_by_id_sql(table), (row_id,))
             row = cursor.fetchone()
         conn.close()
         return jsonify(row if row else {'error': 'Not found'})
@@ -529,277 +1419,144 @@ def get_command_log_by_id(command_log_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/command_log/<int:command_log_id>', methods=['PUT'])
-def update_command_log(command_log_id):
-    try:
-        payload = request.get_json()
-        updates = ', '.join([f"{k}=%s" for k in payload])
-        values = list(payload.values())
-        values.append(command_log_id)
-
-        sql = f"UPDATE command_log SET {updates} WHERE command_log_id=%s"
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'updated', 'command_log_id': command_log_id})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/command_log/<int:command_log_id>', methods=['DELETE'])
-def delete_command_log(command_log_id):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM command_log WHERE command_log_id=%s", (command_log_id,))
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'deleted', 'command_log_id': command_log_id})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# === alarm_event 表 CRUD 接口 ===
-
-@app.route('/alarm_event', methods=['POST'])
-def insert_alarm_event():
+def crud_update(table, row_id):
+    pk = CRUD_TABLES[table]
     try:
-        payload = request.get_json()
-        keys = list(payload.keys())
-        values = [payload[k] for k in keys]
-
-        placeholders = ', '.join(['%s'] * len(keys))
-        columns = ', '.join(keys)
-        sql = f"INSERT INTO alarm_event ({columns}) VALUES ({placeholders})"
+        row = prepare_row(table, request.get_json())
+        columns = tuple(row)
+        values = list(row.values())
+        values.append(row_id)
 
-        conn = pymysql.connect(**db_config)
+        conn = db_connect()
         with conn.cursor() as cursor:
-            cursor.execute(sql, values)
+            cursor.execute(update_sql(table, columns), values)
         conn.commit()
         conn.close()
-        return jsonify({'status': 'inserted', 'fields': keys}), 201
+        return jsonify({'status': 'updated', pk: row_id})
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/alarm_event', methods=['GET'])
-def get_all_alarm_event():
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM alarm_event")
-            rows = cursor.fetchall()
-        conn.close()
-        return jsonify(rows)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/alarm_event/<int:alarm_event_id>', methods=['GET'])
-def get_alarm_event_by_id(alarm_event_id):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM alarm_event WHERE alarm_event_id=%s", (alarm_event_id,))
-            row = cursor.fetchone()
-        conn.close()
-        return jsonify(row if row else {'error': 'Not found'})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/alarm_event/<int:alarm_event_id>', methods=['PUT'])
-def update_alarm_event(alarm_event_id):
+def crud_bulk_update(table):
     try:
         payload = request.get_json()
-        updates = ', '.join([f"{k}=%s" for k in payload])
-        values = list(payload.values())
-        values.append(alarm_event_id)
-
-        sql = f"UPDATE alarm_event SET {updates} WHERE alarm_event_id=%s"
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'updated', 'alarm_event_id': alarm_event_id})
+        if not isinstance(payload, list):
+            raise PayloadError('Bulk update expects a JSON array')
+        count = update_rows(table, [prepare_row(table, item) for item in payload])
+        return jsonify({'status': 'updated', 'count': count})
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/alarm_event/<int:alarm_event_id>', methods=['DELETE'])
-def delete_alarm_event(alarm_event_id):
+def crud_delete(table, row_id):
+    pk = CRUD_TABLES[table]
     try:
-        conn = pymysql.connect(**db_config)
+        conn = db_connect()
         with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM alarm_event WHERE alarm_event_id=%s", (alarm_event_id,))
+            cursor.execute(delete_sql(table, 1), (row_id,))
         conn.commit()
         conn.close()
-        return jsonify({'status': 'deleted', 'alarm_event_id': alarm_event_id})
+        return jsonify({'status': 'deleted', pk: row_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# === face_whitelist 表 CRUD 接口 ===
 
-@app.route('/face_whitelist', methods=['POST'])
-def insert_face_whitelist():
+def crud_bulk_delete(table):
+    pk = CRUD_TABLES[table]
     try:
         payload = request.get_json()
-        keys = list(payload.keys())
-        values = [payload[k] for k in keys]
+        ids = payload.get('ids') if isinstance(payload, dict) else payload
+        if not isinstance(ids, list) or not ids:
+            raise PayloadError('Bulk delete expects a non-empty id array')
+        schema = get_table_schema(table)
+        ids = [coerce_value(pk, schema[pk], i) for i in ids]
 
-        placeholders = ', '.join(['%s'] * len(keys))
-        columns = ', '.join(keys)
-        sql = f"INSERT INTO face_whitelist ({columns}) VALUES ({placeholders})"
-
-        conn = pymysql.connect(**db_config)
+        conn = db_connect()
         with conn.cursor() as cursor:
-            cursor.execute(sql, values)
+            deleted = cursor.execute(delete_sql(table, len(ids)), ids)
         conn.commit()
         conn.close()
-        return jsonify({'status': 'inserted', 'fields': keys}), 201
+        return jsonify({'status': 'deleted', 'count': deleted})
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/face_whitelist', methods=['GET'])
-def get_all_face_whitelist():
+def register_crud_routes(table, id_converter='int'):
+    pk = CRUD_TABLES[table]
+    item_rule = f'/{table}/<{id_converter}:{pk}>' if id_converter else f'/{table}/<{pk}>'
+
+    app.add_url_rule(f'/{table}', f'insert_{table}',
+                     lambda: crud_insert(table), methods=['POST'])
+    app.add_url_rule(f'/{table}', f'get_all_{table}',
+                     lambda: crud_get_all(table), methods=['GET'])
+    app.add_url_rule(f'/{table}', f'bulk_update_{table}',
+                     lambda: crud_bulk_update(table), methods=['PUT'])
+    app.add_url_rule(f'/{table}', f'bulk_delete_{table}',
+                     lambda: crud_bulk_delete(table), methods=['DELETE'])
+    app.add_url_rule(item_rule, f'get_{table}_by_id',
+                     lambda **kw: crud_get_by_id(table, kw[pk]), methods=['GET'])
+    app.add_url_rule(item_rule, f'update_{table}',
+                     lambda **kw: crud_update(table, kw[pk]), methods=['PUT'])
+    app.add_url_rule(item_rule, f'delete_{table}',
+                     lambda **kw: crud_delete(table, kw[pk]), methods=['DELETE'])
+
+
+register_crud_routes('device', id_converter=None)
+register_crud_routes('command_log')
+register_crud_routes('alarm_event')
+register_crud_routes('face_whitelist')
+register_crud_routes('emergency_contact')
+
+# === 指标导出接口 ===
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    lines = request_latency.render() + request_count.render() + operation_latency.render()
+    lines += [
+        "# HELP sse_subscribers Connected /stream clients",
+        "# TYPE sse_subscribers gauge",
+        f"sse_subscribers {len(event_hub.subscribers)}",
+        "# HELP alarm_queue_size Alarms waiting to be written",
+        "# TYPE alarm_queue_size gauge",
+        f"alarm_queue_size {alarm_writer.queue.qsize()}",
+    ]
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+# === 健康检查接口 ===
+# /healthz 只表示进程存活；/readyz 检查数据库可连通，不可用时返回 503，供负载均衡摘除节点
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    checks = {'faces_loaded': face_recognition is not None}
     try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM face_whitelist")
-            rows = cursor.fetchall()
-        conn.close()
-        return jsonify(rows)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/face_whitelist/<int:face_whitelist_id>', methods=['GET'])
-def get_face_whitelist_by_id(face_whitelist_id):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM face_whitelist WHERE face_whitelist_id=%s", (face_whitelist_id,))
-            row = cursor.fetchone()
-        conn.close()
-        return jsonify(row if row else {'error': 'Not found'})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/face_whitelist/<int:face_whitelist_id>', methods=['PUT'])
-def update_face_whitelist(face_whitelist_id):
-    try:
-        payload = request.get_json()
-        updates = ', '.join([f"{k}=%s" for k in payload])
-        values = list(payload.values())
-        values.append(face_whitelist_id)
-
-        sql = f"UPDATE face_whitelist SET {updates} WHERE face_whitelist_id=%s"
-        conn = pymysql.connect(**db_config)
+        conn = db_connect()
         with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
+            cursor.execute("SELECT 1")
         conn.close()
-        return jsonify({'status': 'updated', 'face_whitelist_id': face_whitelist_id})
+        checks['database'] = 'ok'
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        checks['database'] = str(e)
+        return jsonify({'status': 'unavailable', 'checks': checks}), 503
+    return jsonify({'status': 'ready', 'checks': checks})
 
 
-@app.route('/face_whitelist/<int:face_whitelist_id>', methods=['DELETE'])
-def delete_face_whitelist(face_whitelist_id):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM face_whitelist WHERE face_whitelist_id=%s", (face_whitelist_id,))
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'deleted', 'face_whitelist_id': face_whitelist_id})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# === emergency_contact 表 CRUD 接口 ===
-
-@app.route('/emergency_contact', methods=['POST'])
-def insert_emergency_contact():
-    try:
-        payload = request.get_json()
-        keys = list(payload.keys())
-        values = [payload[k] for k in keys]
-
-        placeholders = ', '.join(['%s'] * len(keys))
-        columns = ', '.join(keys)
-        sql = f"INSERT INTO emergency_contact ({columns}) VALUES ({placeholders})"
-
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'inserted', 'fields': keys}), 201
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
+def preload():
+    """多进程部署时在主进程 fork 前调用，提前加载人脸模型、已知人脸编码和表结构"""
+    load_known_faces()
+    load_table_schemas()
 
-@app.route('/emergency_contact', methods=['GET'])
-def get_all_emergency_contact():
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM emergency_contact")
-            rows = cursor.fetchall()
-        conn.close()
-        return jsonify(rows)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/emergency_contact/<int:emergency_contact_id>', methods=['GET'])
-def get_emergency_contact_by_id(emergency_contact_id):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute("SELECT * FROM emergency_contact WHERE emergency_contact_id=%s", (emergency_contact_id,))
-            row = cursor.fetchone()
-        conn.close()
-        return jsonify(row if row else {'error': 'Not found'})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/emergency_contact/<int:emergency_contact_id>', methods=['PUT'])
-def update_emergency_contact(emergency_contact_id):
-    try:
-        payload = request.get_json()
-        updates = ', '.join([f"{k}=%s" for k in payload])
-        values = list(payload.values())
-        values.append(emergency_contact_id)
-
-        sql = f"UPDATE emergency_contact SET {updates} WHERE emergency_contact_id=%s"
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute(sql, values)
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'updated', 'emergency_contact_id': emergency_contact_id})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-
-@app.route('/emergency_contact/<int:emergency_contact_id>', methods=['DELETE'])
-def delete_emergency_contact(emergency_contact_id):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM emergency_contact WHERE emergency_contact_id=%s", (emergency_contact_id,))
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'deleted', 'emergency_contact_id': emergency_contact_id})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
 
 # === 启动 Flask 应用 ===
+# 开发调试用；生产环境用 gunicorn -c gunicorn.conf.py 启动（见 README）
 if __name__ == '__main__':
+    preload()
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,52 @@
+"""生产环境 gunicorn 配置，参数都可以用环境变量覆盖：
+
+    HOME_AI_BIND      监听地址，默认 0.0.0.0:5000
+    HOME_AI_WORKERS   worker 进程数，默认 1
+    HOME_AI_THREADS   每个 worker 的线程数，默认 16（/stream 长连接每个占一个线程）
+    SSE_MAX_SUBSCRIBERS  每个 worker 的 /stream 订阅上限，默认 HOME_AI_THREADS 的一半
+    HOME_AI_TIMEOUT   worker 超时秒数，默认 120（人脸识别、大模型请求较慢）
+    HOME_AI_PRELOAD   1 为主进程预加载后再 fork，默认 1
+
+预加载时主进程先加载人脸模型、已知人脸编码和表结构，再 gc.freeze() 后 fork，
+各 worker 写时复制共享这部分内存，不再各自加载。
+
+gthread 下每个 /stream 订阅会一直占住一个线程，订阅数接近 HOME_AI_THREADS 时
+普通接口就没有线程可用。所以订阅上限默认只给一半线程，超出的订阅直接返回 503；
+需要更多实时订阅时应同时调大 HOME_AI_THREADS，保证上限始终明显小于线程数。
+
+注意：/iot-data 的两半数据合并缓存、/stream 订阅和告警滚动状态都在进程内，
+多个 worker 时同一设备的上报可能落到不同进程而无法合并，
+HOME_AI_WORKERS 大于 1 时需要保证同一设备的上报固定发往同一个 worker。
+
+/metrics 的耗时直方图和计数器同样只统计所在 worker，不跨进程汇总：
+多个 worker 时每次抓取随机落到其中一个，计数会来回跳、吞吐量只有一部分。
+用 /metrics 评估容量时请以 HOME_AI_WORKERS=1 运行（靠 HOME_AI_THREADS 扩并发），
+或者改用 benchmark.py 在客户端统计。
+"""
+import gc
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('HOME_AI_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('HOME_AI_WORKERS', '1'))
+worker_class = 'gthread'
+threads = int(os.environ.get('HOME_AI_THREADS', '16'))
+# 配置文件先于应用加载，应用导入时读取这个值作为 /stream 订阅上限
+os.environ.setdefault('SSE_MAX_SUBSCRIBERS', str(max(1, threads // 2)))
+timeout = int(os.environ.get('HOME_AI_TIMEOUT', '120'))
+preload_app = os.environ.get('HOME_AI_PRELOAD', '1') == '1'
+accesslog = '-'
+
+
+def when_ready(server):
+    # 在 fork 出 worker 之前执行
+    if preload_app:
+        from flask_face_server import preload
+        preload()
+        gc.freeze()
+
+
+def worker_exit(server, worker):
+    # worker 退出前把还没写库的告警写完
+    from flask_face_server import alarm_writer
+    alarm_writer.close()
@@ -0,0 +1,2 @@
+"""gunicorn 入口：gunicorn -c gunicorn.conf.py"""
+from flask_face_server import app  # noqa: F401